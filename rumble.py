@@ -6,7 +6,75 @@ from tkinter import ttk
 from labjack import ljm	
 import json
 import math
+import os
+import struct
 import time
+from collections import deque
+
+# Numpy is optional.  It is only needed by the stream-mode home search.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Numba is optional.  If it is installed, the home edge search is 
+# compiled when the module is imported.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# The calibration helpers are deliberately NOT compiled.  Calling a numba
+# function from Python costs more than the few float operations inside,
+# so compiling them made every call slower.
+def _cal_to_counts(value, slope, zero):
+    """Convert a position in calibrated units to counts
+    counts = _cal_to_counts(value, slope, zero)
+"""
+    return value/slope + zero
+
+def _counts_to_cal(counts, slope, zero):
+    """Convert a position in counts to calibrated units
+    value = _counts_to_cal(counts, slope, zero)
+"""
+    return slope*(counts - zero)
+
+def _find_edge(state, initial):
+    """Return the index of the first sample that differs from initial
+    index = _find_edge(state, initial)
+    
+The state is a 1D int64 array of home pin samples.  Returns -1 if 
+every sample is equal to initial.
+"""
+    index = int(np.argmax(state != initial))
+    return index if state[index] != initial else -1
+
+if numba is not None:
+    # The compiled search stops at the first change instead of comparing
+    # every sample.  An explicit signature forces compilation now instead
+    # of on the first call, and cache=True saves the compiled code so 
+    # later imports do not need to compile it at all.
+    @numba.njit('int64(int64[:], int64)', cache=True)
+    def _find_edge(state, initial):
+        for index in range(state.size):
+            if state[index] != initial:
+                return index
+        return -1
+
+def _wait(duration):
+    """Block program execution for at least [duration] seconds
+    _wait(duration)
+    
+The deadline is measured on the monotonic clock, and the sleep is 
+repeated until it has passed, so the wait is never cut short.
+"""
+    deadline = time.monotonic() + duration
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(remaining)
 
 
 
@@ -32,9 +100,9 @@ the (invert) attribute to True.
 
 Motors can optionally be configured with a "home_pin", which changes
 when the motor arrives at a home location.  The home() method 
-iteratively advances the motor position until the value on the home pin 
-changes.  At this position, the motor is said to be "homed."  Usually
-this is physically accomplished by a photo interrupter or a limit switch.
+advances the motor position until the value on the home pin changes.
+At this position, the motor is said to be "homed."  Usually this is 
+physically accomplished by a photo interrupter or a limit switch.
 
 MANUALLY FROM THE PYTHON TERMINAL
 
@@ -69,6 +137,13 @@ parameters.
 A template file can be created for editing by evoking the save() method.
 
     M.save(filename)
+    
+For faster loading, the same parameters can be saved in a binary file 
+with save_bin() and read with load_bin().  Binary files are not 
+human-readable, so the JSON files should be kept for editing.
+
+    M.save_bin(filename)
+    M.load_bin(filename)
 
 CONFIGURATION PARAMETERS
     
@@ -82,6 +157,8 @@ WRITE TO THESE ATTRIBUTES; it can cause undefined behavior.
         (INVERT is the only attribute that may be safely changed manually)
     lim_upper   Upper software limit of motion
     lim_lower   Lower software limit of motion
+    home_edge   The position in counts at which home() found the edge
+                (home_edge=None : home() has not found the edge)
 * CALIBRATION *
     cal_slope   position = cal_slope * (counts - cal_zero)
     cal_zero
@@ -106,6 +183,8 @@ help for each.
     set_pins( dir_pin, pulse_pin, home_pin )
     load( filename )
     save( filename )
+    load_bin( filename )
+    save_bin( filename )
 * INIT STATUS *
     roll, divisor = get_clock()
     pulse_rate_hz = get_clock_hz()
@@ -154,6 +233,24 @@ Author: Christopher R. Martin
 Originally Written: January 2024
 Please modify, share, use freely!
 """
+    # Fixed attribute storage is smaller and faster than a __dict__
+    __slots__ = ('handle', 'invert', 
+            'dir_pin', 'dir_reg', 'pulse_pin', 'pulse_reg', 
+            'home_pin', 'home_reg', 'counts', 'home_edge', 
+            'cal_zero', 'cal_slope', 'cal_units', 
+            'lim_upper', 'lim_lower', '_lim_upper_counts', '_lim_lower_counts',
+            '_roll', '_divisor', '_pulse_hz', '_inv_pulse_hz',
+            '_move_names', '_ef_names')
+    
+    # Layout of the binary configuration files written by save_bin():
+    # magic, clock roll, clock divisor, dir pin, pulse pin, home pin, 
+    # invert, cal slope, cal zero, cal units, and the upper and lower 
+    # limits, each with a flag that is False if the limit is disabled.
+    _config_magic = b'RMB1'
+    _config_struct = struct.Struct('<4sIIiii?dd32s?q?q')
+    # Parsed configuration files; see _read_config()
+    _config_cache = {}
+    
     def __init__(self, handle):
        
         self.handle = handle
@@ -164,46 +261,53 @@ Please modify, share, use freely!
         self.pulse_reg = ''
         self.home_pin = -1
         self.home_reg = ''
+        self._move_names = []
+        self._ef_names = ()
         
         # Always wake up at zero counts
         self.counts = 0
+        self.home_edge = None
         # Set up the calibration for counts by default
-        self.cal_zero = 0
-        self.cal_slope = 1
+        # These are always floats so the calibration arithmetic does not
+        # need to convert them on every call
+        self.cal_zero = 0.
+        self.cal_slope = 1.
         self.cal_units = 'counts'
         
         # Set up software limits
         self.lim_upper = None
         self.lim_lower = None
+        self._cache_lim()
         
-    def save(self, filename):
-        """Save the motor configuration to a file
-    M.save(filename)
-
-Writes a text file with configuration parameters for the motor
+        # Cached clock settings; these are populated by set_clock() or
+        # by the first call to get_clock()
+        self._roll = None
+        self._divisor = None
+        self._pulse_hz = None
+        self._inv_pulse_hz = None
+        
+    def _get_config(self):
+        """Return a dictionary of the motor configuration parameters
+    config = M._get_config()
 """
-        with open(filename, 'w') as ff:
-            roll, divisor = self.get_clock()
-            config = {
-                'clock_roll': roll,
-                'clock_divisor': divisor,
-                'dir_pin': self.dir_pin,
-                'pulse_pin': self.pulse_pin,
-                'home_pin': self.home_pin,
-                'invert': self.invert,
-                'cal_slope': self.cal_slope,
-                'cal_zero': self.cal_zero,
-                'cal_units': self.cal_units,
-                'lim_upper': self.lim_upper,
-                'lim_lower': self.lim_lower
-            }
-            json.dump(config, ff, indent=4)
+        roll, divisor = self.get_clock()
+        return {
+            'clock_roll': roll,
+            'clock_divisor': divisor,
+            'dir_pin': self.dir_pin,
+            'pulse_pin': self.pulse_pin,
+            'home_pin': self.home_pin,
+            'invert': self.invert,
+            'cal_slope': self.cal_slope,
+            'cal_zero': self.cal_zero,
+            'cal_units': self.cal_units,
+            'lim_upper': self.lim_upper,
+            'lim_lower': self.lim_lower
+        }
         
-    def load(self, filename):
-        """Load the motor configuration and calibration from a file
-    M.load(filename)
-
-Reads from a text file with configuration parameters for the motor
+    def _apply_config(self, config):
+        """Check and apply a dictionary of configuration parameters
+    M._apply_config(config)
 """
         # What are the mandatory configuration parameters?
         mandatory = {'clock_roll', 'clock_divisor', 'dir_pin', 'pulse_pin'}
@@ -211,11 +315,6 @@ Reads from a text file with configuration parameters for the motor
         allowed = {'home_pin', 'cal_slope', 'cal_zero', 'cal_units',
             'lim_upper', 'lim_lower', 'invert'}
         allowed = allowed.union(mandatory)
-        
-        # Attempt to parse the json configuration file
-        with open(filename, 'r') as ff:
-            # Load the configuration parameters
-            config = json.load(ff)
             
         # Check to see which if there were unrecognized parameters
         # or missing mandatory parameters
@@ -240,7 +339,6 @@ Reads from a text file with configuration parameters for the motor
             home_pin = config['home_pin']
         
         # Apply the pin settings
-        self.set_clock(roll, divisor)
         self.set_pins(dir_pin=dir_pin, pulse_pin=pulse_pin, home_pin=home_pin)
         
         
@@ -248,15 +346,136 @@ Reads from a text file with configuration parameters for the motor
         if 'invert' in config:
             self.invert = bool(config['invert'])
         if 'cal_slope' in config:
-            self.cal_slope = config['cal_slope']
+            self.cal_slope = float(config['cal_slope'])
         if 'cal_zero' in config:
-            self.cal_zero = config['cal_zero']
+            self.cal_zero = float(config['cal_zero'])
         if 'cal_units' in config:
             self.cal_units = config['cal_units']
         if 'lim_upper' in config:
             self.lim_upper = config['lim_upper']
         if 'lim_lower' in config:
             self.lim_lower = config['lim_lower']
+        self._cache_lim()
+        
+    def _read_config(self, filename, parse):
+        """Return the configuration dictionary from a file
+    config = M._read_config(filename, parse)
+    
+The parse function accepts an open binary file and returns the 
+configuration dictionary.  Parsed configurations are kept in the class
+_config_cache, so a file that has not been modified since it was last 
+read with the same parse function is not read again.  A file counts as
+modified if either its modification time or its size has changed.
+"""
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        # The same file may not be valid for a different parser
+        key = (path, parse)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = Motor._config_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path, 'rb') as ff:
+            config = parse(ff)
+        Motor._config_cache[key] = (stamp, config)
+        return config
+        
+    @staticmethod
+    def _forget_config(filename):
+        """Remove a file from the _config_cache for every parse function
+    Motor._forget_config(filename)
+"""
+        path = os.path.abspath(filename)
+        for key in [key for key in Motor._config_cache if key[0] == path]:
+            del Motor._config_cache[key]
+        
+    def save(self, filename):
+        """Save the motor configuration to a file
+    M.save(filename)
+
+Writes a text file with configuration parameters for the motor
+"""
+        # Serialize first so the file is written in a single call
+        text = json.dumps(self._get_config(), indent=4)
+        with open(filename, 'w') as ff:
+            ff.write(text)
+        Motor._forget_config(filename)
+        
+    def load(self, filename):
+        """Load the motor configuration and calibration from a file
+    M.load(filename)
+
+Reads from a text file with configuration parameters for the motor
+"""
+        self._apply_config(self._read_config(filename, json.load))
+        
+    def save_bin(self, filename):
+        """Save the motor configuration to a binary file
+    M.save_bin(filename)
+
+Writes the same parameters as save(), but in a fixed binary layout that 
+is faster to load.  The file is not human-readable; use save() to 
+create a file for editing.  The cal_units string is limited to 32 bytes.
+"""
+        config = self._get_config()
+        units = config['cal_units'].encode('utf-8')
+        if len(units) > 32:
+            raise Exception('The cal_units string is too long to save: ' + 
+                    repr(config['cal_units']))
+        lim_upper = config['lim_upper']
+        lim_lower = config['lim_lower']
+        data = Motor._config_struct.pack(
+                Motor._config_magic,
+                config['clock_roll'],
+                config['clock_divisor'],
+                config['dir_pin'],
+                config['pulse_pin'],
+                config['home_pin'],
+                config['invert'],
+                config['cal_slope'],
+                config['cal_zero'],
+                units,
+                lim_upper is not None,
+                0 if lim_upper is None else int(lim_upper),
+                lim_lower is not None,
+                0 if lim_lower is None else int(lim_lower))
+        with open(filename, 'wb') as ff:
+            ff.write(data)
+        Motor._forget_config(filename)
+        
+    def load_bin(self, filename):
+        """Load the motor configuration from a binary file
+    M.load_bin(filename)
+
+Reads a file written by save_bin().
+"""
+        self._apply_config(self._read_config(filename, Motor._parse_bin))
+        
+    @staticmethod
+    def _parse_bin(ff):
+        """Parse a binary configuration file written by save_bin()
+    config = Motor._parse_bin(ff)
+"""
+        data = ff.read()
+        if len(data) != Motor._config_struct.size or \
+                not data.startswith(Motor._config_magic):
+            raise Exception('Not a binary motor configuration file.')
+        (magic, roll, divisor, dir_pin, pulse_pin, home_pin, invert, 
+                cal_slope, cal_zero, units, has_upper, lim_upper, 
+                has_lower, lim_lower) = Motor._config_struct.unpack(data)
+        return {
+            'clock_roll': roll,
+            'clock_divisor': divisor,
+            'dir_pin': dir_pin,
+            'pulse_pin': pulse_pin,
+            'home_pin': home_pin,
+            'invert': invert,
+            'cal_slope': cal_slope,
+            'cal_zero': cal_zero,
+            'cal_units': units.rstrip(b'\0').decode('utf-8'),
+            'lim_upper': lim_upper if has_upper else None,
+            'lim_lower': lim_lower if has_lower else None
+        }
         
         
         
@@ -265,9 +484,19 @@ Reads from a text file with configuration parameters for the motor
         return f'<Motor Instance @ {self.get_cal()} {self.cal_units}>'
         
 
-    def get_clock(self):
+    def _cache_clock(self, roll, divisor):
+        """Record the clock settings so they need not be read from the T4
+"""
+        self._roll = roll
+        self._divisor = divisor
+        self._pulse_hz = 80e6 / divisor / roll
+        self._inv_pulse_hz = divisor * roll / 80e6
+
+    def get_clock(self, sync=False):
         """Return the clock roll and divisor settings
    roll, divisor = M.get_clock()
+        OR
+   roll, divisor = M.get_clock(sync=True)
    
 The T4 system clock is 80MHz, so the pulse frequency will be
     80MHz / roll / divisor
@@ -275,17 +504,25 @@ The T4 system clock is 80MHz, so the pulse frequency will be
 Divisor is always a power of 2, and is used for coarse setting of the
 frequency.  The roll value can take on any integer value (32 bit) and
 is used for fine tuning of the pulse frequency.
+
+The settings written by set_clock() are remembered, so the T4 is only 
+read the first time, or when sync=True.  The clock is shared by all
+extended features, so if another Motor instance on the same device has
+changed the clock, use sync=True to re-read the settings.
 """
-        divisor = int(ljm.eReadName(self.handle, 'DIO_EF_CLOCK0_DIVISOR'))
-        roll = int(ljm.eReadName(self.handle, 'DIO_EF_CLOCK0_ROLL_VALUE'))
-        return roll, divisor
+        if sync or self._roll is None:
+            divisor = int(ljm.eReadName(self.handle, 'DIO_EF_CLOCK0_DIVISOR'))
+            roll = int(ljm.eReadName(self.handle, 'DIO_EF_CLOCK0_ROLL_VALUE'))
+            self._cache_clock(roll, divisor)
+        return self._roll, self._divisor
 
     def get_clock_hz(self):
         """Return the pulse rate in Hz
     rate = M.get_cock_hz(self)
 """
-        roll,divisor = self.get_clock()
-        return 80e6 / divisor / roll
+        if self._pulse_hz is None:
+            self.get_clock()
+        return self._pulse_hz
         
     def set_clock(self, roll, divisor):
         """Set the T4 extended feature clock settings
@@ -301,10 +538,15 @@ is used for fine tuning of the pulse frequency.
         # Coerce to be an integer
         roll = int(roll)
         divisor = int(divisor)
-        ljm.eWriteName(self.handle, 'DIO_EF_CLOCK0_ENABLE', 0)
-        ljm.eWriteName(self.handle, 'DIO_EF_CLOCK0_ROLL_VALUE', roll)
-        ljm.eWriteName(self.handle, 'DIO_EF_CLOCK0_DIVISOR', divisor)
-        ljm.eWriteName(self.handle, 'DIO_EF_CLOCK0_ENABLE', 1)
+        # Disable the clock, configure it, and re-enable it in a single
+        # transaction.  The registers are written in order.
+        names = ['DIO_EF_CLOCK0_ENABLE',
+                'DIO_EF_CLOCK0_ROLL_VALUE',
+                'DIO_EF_CLOCK0_DIVISOR',
+                'DIO_EF_CLOCK0_ENABLE']
+        values = [0, roll, divisor, 1]
+        ljm.eWriteNames(self.handle, len(names), names, values)
+        self._cache_clock(roll, divisor)
 
         
     def set_clock_hz(self, rate):
@@ -312,10 +554,11 @@ is used for fine tuning of the pulse frequency.
     M.set_clock_hz(self, rate)
 """
         roll = int(80e6 / abs(rate))
-        divisor = 1
-        while roll > 0xFFFFFFFF:
-            roll >>= 1
-            divisor <<= 1
+        # Shift roll down just far enough to fit in 32 bits, and move
+        # the same factor of 2 into the divisor
+        shift = max(0, roll.bit_length() - 32)
+        divisor = 1 << shift
+        roll >>= shift
         self.set_clock(roll, divisor)
         
         
@@ -342,8 +585,21 @@ This function assigns values to the following instance attributes:
         self.dir_pin = int(dir_pin)
         self.dir_reg = f'DIO{self.dir_pin}'
         self.pulse_pin = int(pulse_pin)
-        self.pulse_reg = f'DIO{self.pulse_pin}_EF_CONFIG_C'
+        # Extended feature registers for the pulse pin
+        # These are built once and reused by the other methods
+        p = self.pulse_pin
+        self._ef_names = ef = (
+            f'DIO{p}_EF_ENABLE',    # 0
+            f'DIO{p}_EF_INDEX',     # 1
+            f'DIO{p}_EF_CONFIG_A',  # 2
+            f'DIO{p}_EF_CONFIG_B',  # 3
+            f'DIO{p}_EF_CONFIG_C',  # 4
+            f'DIO{p}_EF_READ_A',    # 5
+            f'DIO{p}')              # 6
+        self.pulse_reg = ef[4]
         self.invert = bool(invert)
+        # Registers written by increment() on every move
+        self._move_names = [self.dir_reg, self.pulse_reg]
         
         # Get the current IO mask
         iomask = int(ljm.eReadName(self.handle, 'DIO_DIRECTION'))
@@ -363,30 +619,41 @@ This function assigns values to the following instance attributes:
         # Figure out the timing parameters
         roll, divisor = self.get_clock()
    
-        # Disable optional analog pins
-        ljm.eWriteName(self.handle, 'DIO_ANALOG_ENABLE', 0x0F)
-        # Write to the direction mask
-        ljm.eWriteName(self.handle, 'DIO_DIRECTION', iomask)
-        
-        # Set the direction pin negative
-        ljm.eWriteName(self.handle, self.dir_reg, 0)
-        
-        # Configure the extended feature for the pulse pin
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}_EF_ENABLE', 0)    # Disable the extended feature while configuring
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}_EF_INDEX', 2)     # 
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}_EF_CONFIG_B', 0)      # Transition low->high at time 0
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}_EF_CONFIG_A', roll//2)   # Transition high->low at time 5000
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}_EF_CONFIG_C', 1)  # Move 1 step - config fails otherwise
-        # Enable the EF channel
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}', 0)              # Force the pin low
-        ljm.eWriteName(self.handle, f'DIO{self.pulse_pin}_EF_ENABLE', 1)    # Go
-        
-        # Undo the step moved during configuration
-        ljm.eWriteName(self.handle, self.dir_reg, 1)
-        ljm.eWriteName(self.handle, self.pulse_reg, 1)
-        
-        
-    def set_lim_upper(value=None, cal=False, here=False):
+        # The configuration is written to the T4 in a single transaction.
+        # The registers are written in the order they appear here, so the
+        # sequence is the same as if they were written one at a time.
+        names = [
+            'DIO_ANALOG_ENABLE',                # Disable optional analog pins
+            'DIO_DIRECTION',                    # Write to the direction mask
+            self.dir_reg,                       # Set the direction pin negative
+            # Configure the extended feature for the pulse pin
+            ef[0],          # Disable the extended feature while configuring
+            ef[1],          # 
+            ef[3],          # Transition low->high at time 0
+            ef[2],          # Transition high->low at time 5000
+            ef[4],          # Move 1 step - config fails otherwise
+            # Enable the EF channel
+            ef[6],          # Force the pin low
+            ef[0],          # Go
+            # Undo the step moved during configuration
+            self.dir_reg,
+            self.pulse_reg]
+        values = [0x0F, iomask, 0, 0, 2, 0, roll//2, 1, 0, 1, 1, 1]
+        ljm.eWriteNames(self.handle, len(names), names, values)
+        
+        
+    def _cache_lim(self):
+        """Update the limits used by increment() from lim_upper and lim_lower
+    
+Disabled limits are replaced by values far beyond any reachable 
+position so increment() can clamp without testing for None.
+"""
+        self._lim_upper_counts = 1<<62 if self.lim_upper is None \
+                else int(self.lim_upper)
+        self._lim_lower_counts = -(1<<62) if self.lim_lower is None \
+                else int(self.lim_lower)
+        
+    def set_lim_upper(self, value=None, cal=False, here=False):
         """Set the upper software limit in counts
     M.set_lim_upper()           # Disable the limit
         OR
@@ -408,13 +675,14 @@ motor.
             # If not, clear the limit
             else:
                 self.lim_upper = None
-            return
-        # Do we need to calculate a position from a calibrated unit?
-        if cal:
-            value = value/self.cal_slope + self.cal_zero
-        self.lim_upper = int(value)
+        else:
+            # Do we need to calculate a position from a calibrated unit?
+            if cal:
+                value = _cal_to_counts(value, self.cal_slope, self.cal_zero)
+            self.lim_upper = int(value)
+        self._cache_lim()
         
-    def set_lim_lower(value=None, cal=False, here=False):
+    def set_lim_lower(self, value=None, cal=False, here=False):
         """Set the lower software limit in counts
 See the set_lim_upper() help for details.
 """
@@ -426,11 +694,12 @@ See the set_lim_upper() help for details.
             # If not, clear the limit
             else:
                 self.lim_lower = None
-            return
-        # Do we need to calculate a position from a calibrated unit?
-        if cal:
-            value = value/self.cal_slope + self.cal_zero
-        self.lim_lower = int(value)
+        else:
+            # Do we need to calculate a position from a calibrated unit?
+            if cal:
+                value = _cal_to_counts(value, self.cal_slope, self.cal_zero)
+            self.lim_lower = int(value)
+        self._cache_lim()
     
     def get_lim_state(self):
         """Return the boolean software limit state
@@ -438,27 +707,27 @@ See the set_lim_upper() help for details.
 
 The state is True if the motor has reached one of the software limits
 """
-        if self.lim_lower is not None and self.counts <= self.lim_lower:
-            return True
-        elif self.lim_upper is not None and self.counts >= self.lim_upper:
-            return True
-        return False
+        counts = self.counts
+        return counts <= self._lim_lower_counts \
+                or counts >= self._lim_upper_counts
             
-    def home(self, increment, max_tries=100):
+    def home(self, increment, max_tries=100, stream=False):
         """Seek the motor home
     success = M.home(increment)
         OR
     success = M.home(increment, max_tries)
+        OR
+    success = M.home(increment, max_tries, stream=True)
     
 The home is the position at which counts is zero.  At initialization,
 the Motor object is always presumed to be at home, but if a home pin
 is configured, the motor can be incremented until home is discovered.
 
-The home() method repeatedly advances the motor by [increment] counts
-until the state of the home_pin changes.  Note that this algorithm is
-not sensitive to the polarity of the home pin, since the algorithm
-merely waits for a change.  By default this will be repeated a maximum 
-of 100 increments unless a different max_tries is specified.
+The home() method advances the motor by up to [increment] * [max_tries]
+counts until the state of the home_pin changes.  Note that this 
+algorithm is not sensitive to the polarity of the home pin, since the 
+algorithm merely waits for a change.  By default, the search will cover
+a maximum of 100 increments unless a different max_tries is specified.
 
 ( increment>0 )
              v 
@@ -481,23 +750,180 @@ of 100 increments unless a different max_tries is specified.
 Due to the hysteresis inherent in limit switches and photo interrupters,
 home seeking should ALWAYS be done in the same direction for repeatability.
 
-The choice of value for [increment] is critical.  If [increment] is too
-large, it will be possible to completely miss the home pin pulse.  Also,
-the increment value determines the precision of the homing process.
+The search is commanded as a single pulse burst.  The home pin is armed
+as an interrupt counter with debounce (EF index 9), so the T4 registers
+the edge in hardware even if it happens between polls.  When the edge
+is detected, the burst is aborted, and only then are the pulses that 
+were actually output read back, so the counts always match the motor.
+The motor stops past the edge by however far it moved before the abort
+took effect: up to one poll interval (half a pulse) plus about one USB 
+transaction, regardless of the value of [increment].  The home pin must
+be one of the T4's counter-capable pins (DIO4 through DIO9).
+
+In either mode, the motor is never reversed; it is left where it 
+stopped, just past the edge, and the counts reflect that position.  The
+position at which the edge was found is recorded in the home_edge 
+attribute, so the edge can be used as a reference, for example with
+    M.set(M.get() - M.home_edge)
+
+If stream=True, the home pin is sampled with the LabJack stream mode 
+instead, several times per pulse, and the samples are searched for the
+edge in bulk.  This works with any FIO, EIO, or CIO pin, but the stream
+must not already be running.  Stream mode requires numpy.  The motor 
+may run further past the edge than with the interrupt counter, because
+samples are read in blocks, but home_edge is found from the sample 
+index and is more precise.
 """
         if not self.home_reg:
             raise Exception('The home channel was not configured.')
-        # Detect the initial value of the home pin
-        initial = ljm.eReadName(self.handle, self.home_reg)
-        for try_count in range(max_tries):
-            # Move the stage
-            self.increment(increment,block=True)
-            # Test the home pin
-            if ljm.eReadName(self.handle, self.home_reg) != initial:
-                return True
-        return False
+        self.home_edge = None
+        if self._inv_pulse_hz is None:
+            self.get_clock()
+        if stream:
+            if np is None:
+                raise Exception('Stream-mode homing requires numpy.')
+            return self._home_stream(increment * max_tries)
+            
+        home_prefix = f'DIO{self.home_pin}_EF_'
+        # Arm the debounced interrupt counter on the home pin
+        # The index cannot be changed while the feature is enabled
+        names = [
+            home_prefix + 'ENABLE',
+            home_prefix + 'INDEX',
+            home_prefix + 'CONFIG_A',   # Debounce interval in us
+            home_prefix + 'CONFIG_B',   # Count both edges
+            home_prefix + 'ENABLE']
+        values = [0, 9, 1000, 2, 1]
+        ljm.eWriteNames(self.handle, len(names), names, values)
+        # The edge count and the pulses completed are polled together
+        poll_names = [home_prefix + 'READ_A', self._ef_names[5]]
         
+        try:
+            # Command the entire search as a single burst
+            start = self.counts
+            self.increment(increment * max_tries)
+            # The software limits may have shortened the move
+            travel = self.counts - start
+            
+            # Poll twice per pulse until the burst should be complete
+            poll = 0.5 * self._inv_pulse_hz
+            deadline = time.monotonic() + abs(travel) * self._inv_pulse_hz
+            while True:
+                # Test the deadline BEFORE the counter so an edge on the 
+                # last pulse is not missed
+                expired = time.monotonic() > deadline
+                edges, edge = ljm.eReadNames(self.handle, 2, poll_names)
+                if edges:
+                    # Abort the rest of the burst BEFORE reading the 
+                    # pulse count, so pulses sent during the abort are
+                    # not lost from the counts
+                    ljm.eWriteName(self.handle, self.pulse_reg, 0)
+                    done = int(ljm.eReadName(self.handle, self._ef_names[5]))
+                    self.counts = start + (done if travel > 0 else -done)
+                    # The edge was found within one poll of the pulse 
+                    # count read with it
+                    edge = int(edge)
+                    self.home_edge = start + (edge if travel > 0 else -edge)
+                    return True
+                elif expired:
+                    return False
+                time.sleep(poll)
+        finally:
+            # Leave the home pin as an ordinary digital input
+            ljm.eWriteName(self.handle, home_prefix + 'ENABLE', 0)
+            
+    def _home_stream(self, value):
+        """Seek the home edge by streaming the home pin state
+    success = M._home_stream(value)
+    
+Used by home() when stream=True.  The motor is moved by up to [value]
+counts while the home pin is sampled at several times the pulse rate.
 
+The edge position is found from the index of the first changed sample.
+It does not depend on how long the samples took to reach the host.  The
+stream starts before the burst, so the samples taken before the burst
+started are subtracted.  That lead time is estimated from the host clock,
+so the precision of home_edge is one sample (a quarter pulse) plus about
+half of one USB transaction.  The motor is left where the abort stopped
+it, past the edge.
+"""
+        # Individual DIO registers cannot be streamed, but the 8-bit
+        # FIO, EIO, and CIO state registers can
+        state_reg = ('FIO_STATE', 'EIO_STATE', 'CIO_STATE')[self.home_pin // 8]
+        mask = 1 << (self.home_pin % 8)
+        address = ljm.nameToAddress(state_reg)[0]
+        # Sample four times per pulse.  The edge is located by its 
+        # sample index, so the samples can be read in blocks of about 
+        # 0.1 seconds, but never less than one pulse.
+        samples_per_pulse = 4
+        scan_rate = samples_per_pulse * self.get_clock_hz()
+        scans_per_read = max(samples_per_pulse, int(0.1 * scan_rate))
+        scan_rate = ljm.eStreamStart(self.handle, scans_per_read, 1, 
+                [address], scan_rate)
+        # The first scan is taken about when eStreamStart() returns
+        stream_time = time.monotonic()
+        try:
+            # The stream is already running, so the first sample is
+            # taken before the motor moves
+            start = self.counts
+            # The burst starts sometime during the write
+            write_time = time.monotonic()
+            self.increment(value)
+            burst_time = 0.5 * (write_time + time.monotonic())
+            travel = self.counts - start
+            direction = 1 if travel > 0 else -1
+            # How many scans were taken before the burst started?
+            lead = (burst_time - stream_time) * scan_rate
+            
+            # How many scans will it take to cover the entire burst?
+            total = math.ceil(abs(travel) * self._inv_pulse_hz * scan_rate) \
+                    + scans_per_read
+            initial = None
+            scans = 0
+            while scans < total:
+                data, _, _ = ljm.eStreamRead(self.handle)
+                state = np.asarray(data, dtype=np.int64) & mask
+                if initial is None:
+                    initial = state[0]
+                index = _find_edge(state, initial)
+                if index >= 0:
+                    # Abort the rest of the burst BEFORE reading the 
+                    # pulse count, so pulses sent during the abort are
+                    # not lost from the counts
+                    ljm.eWriteName(self.handle, self.pulse_reg, 0)
+                    done = int(ljm.eReadName(self.handle, self._ef_names[5]))
+                    self.counts = start + direction * done
+                    # Convert the sample index to pulses into the burst.
+                    # The edge cannot be before the burst started or 
+                    # after the last pulse that was output.
+                    edge = int((scans + index - lead) / scan_rate 
+                            * self._pulse_hz)
+                    edge = min(max(edge, 0), done)
+                    self.home_edge = start + direction * edge
+                    return True
+                scans += state.size
+            return False
+        finally:
+            ljm.eStreamStop(self.handle)
+        
+
+    def _limit_move(self, value):
+        """Apply the software limits to an increment
+    value, direction = M._limit_move(value)
+    
+Returns the increment in counts after the software limits have been
+applied, and the value to write to the direction pin.  The counts are
+not changed.
+"""
+        value = int(value)
+        # Clamp the target to the software limits
+        counts = self.counts
+        target = max(self._lim_lower_counts, 
+                min(self._lim_upper_counts, counts + value))
+        value = target - counts
+        # Detect the direction, and invert it if necessary
+        return value, int((value > 0) ^ self.invert)
+        
     def increment(self, value, block=False):
         """Increment the motor position in counts
     M.increment(value)
@@ -508,30 +934,16 @@ position.  To move to an absolute position, use the go() method.
 If the optional keyword, block=True, the method will block program 
 execution until the move has had time to complete.
 """
-        value = int(value)
-        # Detect the direction
-        direction = value > 0
-        # Apply the motor limits as appropriate
-        if direction:
-            # If the upper software limit is set
-            if self.lim_upper is not None:
-                value = min(value, self.lim_upper - self.counts)
-        else:
-            # If the lower software limit is set
-            if self.lim_lower is not None:
-                value = max(value, self.lim_lower - self.counts)
-
-        # Invert the direction?
-        if self.invert:
-            direction = not direction
-            
-        # GO!
-        ljm.eWriteName(self.handle, self.dir_reg, int(direction))
-        ljm.eWriteName(self.handle, self.pulse_reg, abs(value))
+        value, direction = self._limit_move(value)
+        # GO!  Direction and pulse count are sent in one transaction
+        ljm.eWriteNames(self.handle, 2, self._move_names, 
+                [direction, abs(value)])
         self.counts += value
         
         if block:
-            time.sleep(abs(value) / self.get_clock_hz())
+            if self._inv_pulse_hz is None:
+                self.get_clock()
+            _wait(abs(value) * self._inv_pulse_hz)
             
     def increment_cal(self, value, block=False):
         """Increment the motor position in calibrated units
@@ -541,7 +953,7 @@ Accepts negative or positive values to increase or decrease the motor
 position in calibrated units.  To move to an absolute position in 
 calibrated units, use the go_cal() method.
 """
-        value = value / self.cal_slope
+        value = _cal_to_counts(value, self.cal_slope, 0.)
         self.increment(value, block=block)
         
         
@@ -561,7 +973,7 @@ move has completed.
 Go to an aboslute position specified in calibrated units, such as an
 angle or linear position.
 """
-        self.go(target / self.cal_slope + self.cal_zero)
+        self.go(_cal_to_counts(target, self.cal_slope, self.cal_zero))
         
     def get(self):
         """Return the motor position in counts
@@ -573,7 +985,7 @@ angle or linear position.
         """Return the motor position in calibrated units
     value = M.get_cal(self):
 """
-        return self.cal_slope*(self.counts - self.cal_zero)
+        return _counts_to_cal(self.counts, self.cal_slope, self.cal_zero)
         
     def set(self, value):
         """Assign the current position in counts
@@ -585,7 +997,7 @@ angle or linear position.
         """Assign the current position in calibrated units
     M.set_cal(position)
 """
-        self.set(value / self.cal_slope + self.cal_zero)
+        self.set(_cal_to_counts(value, self.cal_slope, self.cal_zero))
         
     def set_cal(self, zero, slope, units):
         """Set the motor's calibration units
@@ -610,11 +1022,105 @@ units   This is the units string used to express the units.
 """
         if slope <= 0:
             raise Exception('The slope MUST be a positive (non-zero) number.')
-        self.cal_zero = zero
-        self.cal_slope = slope
+        self.cal_zero = float(zero)
+        self.cal_slope = float(slope)
         self.cal_units = str(units)
 
 
+def move_both(motor1, motor2, value1, value2, block=False):
+    """Increment two motors in a single transaction
+    move_both(motor1, motor2, value1, value2)
+        OR
+    move_both(motor1, motor2, value1, value2, block=True)
+    
+Moves motor1 by value1 counts and motor2 by value2 counts, exactly as
+if increment() were called on each, but the direction and pulse 
+registers for both motors are written in one USB transaction.  The 
+motors must be two different instances on the same device (e.g. the 
+polarizer and monochrometer returned by global_init()).
+
+If the optional keyword, block=True, the function will block program
+execution until both moves have had time to complete.
+"""
+    if motor1 is motor2:
+        raise Exception('The two motors must be different Motor instances.')
+    if motor1.handle != motor2.handle:
+        raise Exception('Both motors must share the same device handle.')
+    value1, direction1 = motor1._limit_move(value1)
+    value2, direction2 = motor2._limit_move(value2)
+    ljm.eWriteNames(motor1.handle, 4, 
+            motor1._move_names + motor2._move_names,
+            [direction1, abs(value1), direction2, abs(value2)])
+    motor1.counts += value1
+    motor2.counts += value2
+    
+    if block:
+        _wait(max(abs(value1) * motor1._inv_pulse_hz, 
+                abs(value2) * motor2._inv_pulse_hz))
+
+
+class MoveBatcher:
+    """Combine rapid GUI moves into a single pulse burst
+    B = MoveBatcher(root)
+        OR
+    B = MoveBatcher(root, window_ms, batch_size)
+    
+Each motor move costs a USB transaction, and a move commanded while
+the motor is still running interrupts the burst already in progress.
+When a user clicks a button repeatedly, the MoveBatcher collects the
+moves instead of sending them immediately.  When [window_ms] 
+milliseconds have passed since the first queued move, or [batch_size] 
+moves have been queued, the moves are added up and each motor is sent 
+one combined increment.
+
+The root is the Tkinter widget used to schedule the flush with after().
+Any move that does not go through the batcher should call flush() first.
+Otherwise, the queued increments are sent after that move, out of order.
+
+    B.increment_cal(motor, value)   # Queue a move in calibrated units
+    B.flush()                       # Send the queued moves now
+"""
+    def __init__(self, root, window_ms=50, batch_size=10):
+        self.root = root
+        self.window_ms = int(window_ms)
+        self.batch_size = int(batch_size)
+        self._pending = deque()
+        self._after_id = None
+        
+    def increment_cal(self, motor, value):
+        """Queue an increment of a motor in calibrated units
+    B.increment_cal(motor, value)
+"""
+        self._pending.append((motor, value))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._after_id is None:
+            self._after_id = self.root.after(self.window_ms, self._timeout)
+            
+    def _timeout(self):
+        """Flush the queue when the batching window has elapsed
+"""
+        self._after_id = None
+        self.flush()
+        
+    def flush(self):
+        """Send all queued moves
+    B.flush()
+    
+The queued increments are summed for each motor, and each motor is 
+moved once.
+"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        totals = {}
+        while self._pending:
+            motor, value = self._pending.popleft()
+            totals[motor] = totals.get(motor, 0.) + value
+        for motor, value in totals.items():
+            motor.increment_cal(value)
+
+
 def global_init():
     """Global Initializer
     polarizer, monochrometer = global_init()
@@ -667,6 +1173,9 @@ if __name__ == '__main__':
     # Create the master interface window
     root = tk.Tk()
     root.title('Rumble Spectroscopy')
+    # Rapid increment clicks are combined into a single move.  Every
+    # other move flushes the batcher first so moves happen in click order.
+    batcher = MoveBatcher(root)
 
     frame = ttk.Frame(root, width=400, height=200).grid(sticky='NSEW')
 
@@ -677,37 +1186,67 @@ if __name__ == '__main__':
     # Polarizer target value in degrees
     polar_target_deg = tk.DoubleVar()
     
+    # The entry values are parsed only when they are changed, and the
+    # callbacks read them from this cache.  An entry that does not hold
+    # a valid number is removed from the cache.
+    cache = {}
+    def trace_var(key, var):
+        def update(*args):
+            try:
+                cache[key] = var.get()
+            except tk.TclError:
+                cache.pop(key, None)
+        var.trace_add('write', update)
+        update()
+    trace_var('mono_target_nm', mono_target_nm)
+    trace_var('mono_increment_nm', mono_increment_nm)
+    trace_var('polar_target_deg', polar_target_deg)
+    
     def show_error(text):
         mono_status_nm.set(mono_target_nm.get())
     
     # Create some event handlers
     # monochrometer go
     def callback_mono_go(*args):
-        value = mono_target_nm.get()
+        value = cache.get('mono_target_nm')
+        if value is None:
+            print('The monochrometer target is not a number.')
+            return
         print(f'Moving the monochrometer to {value} nm.')
-        monochrometer.go_cal(mono_target_nm.get())
+        batcher.flush()
+        monochrometer.go_cal(value)
         
 
     def callback_mono_incr(*args):
-        value = mono_increment_nm.get()
+        value = cache.get('mono_increment_nm')
+        if value is None:
+            print('The monochrometer increment is not a number.')
+            return
         print(f'Incrementing the monochrometer by {value} nm.')
-        monochrometer.increment_cal(value)
+        batcher.increment_cal(monochrometer, value)
 
     def callback_polar_vert(*args):
         print(f'Setting the polarizer to vertical (0 deg).')
+        batcher.flush()
         polarizer.go_cal(0.)
 
     def callback_polar_hor(*args):
         print('Setting the polarizer to horizontal (90 deg).')
+        batcher.flush()
         polarizer.go_cal(90.)
 
     def callback_polar_ma(*args):
         print(f'Setting the polarizer to the magic angle ({POL_MA} deg).')
+        batcher.flush()
         polarizer.go_cal(POL_MA)
 
     def callback_polar_go(*args):
-        target = polar_target_deg.get()
+        target = cache.get('polar_target_deg')
+        if target is None:
+            print('The polarizer target is not a number.')
+            return
         print(f'Moving the polarizer to {target} deg.')
+        batcher.flush()
         polarizer.go_cal(target)
 
     #